@@ -1,28 +1,77 @@
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import sqlite3
 import time
-from datetime import datetime
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from config import WEATHER_API_KEY
+from data_store import RUNNING_DATA, load_data, save_data
+
+# Rate limiting - OpenWeatherMap allows 60 calls/minute
+REQUEST_INTERVAL_SEC = 1.1  # Just over 1 second between starting calls
+MAX_CONCURRENT_REQUESTS = 30
+
+WEATHER_COLUMNS = ['temperature_c', 'feels_like_c', 'humidity_pct']
+WEATHER_CACHE_DB = 'weather_cache.db'
+
+# Reuse one HTTPS connection pool for every weather call instead of a new handshake per run
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+def get_session():
+    """Shared requests session used for OpenWeatherMap calls"""
+    return _session
+
+def to_unix_timestamp(datetime_str):
+    """Convert a Strava start datetime (or date only) to a unix timestamp"""
+    # Handles both ISO format (2025-07-06T14:30:00Z) and date only (2025-07-06, read as UTC)
+    return int(pd.Timestamp(datetime_str).timestamp())
+
+def weather_cache_key(lat, lon, timestamp):
+    """Runs within ~1km and the same hour share weather: (lat, lon, hour)"""
+    return (round(lat, 2), round(lon, 2), timestamp // 3600)
+
+def _open_weather_cache():
+    conn = sqlite3.connect(WEATHER_CACHE_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS weather_cache (
+            lat_r REAL, lon_r REAL, hour INTEGER,
+            temp REAL, feels REAL, hum REAL,
+            PRIMARY KEY (lat_r, lon_r, hour)
+        )
+    """)
+    return conn
+
+def load_weather_cache():
+    """Load every cached weather lookup as {cache key: weather_info}"""
+    with closing(_open_weather_cache()) as conn:
+        rows = conn.execute('SELECT lat_r, lon_r, hour, temp, feels, hum FROM weather_cache').fetchall()
+    
+    return {
+        (lat_r, lon_r, hour): dict(zip(WEATHER_COLUMNS, (temp, feels, hum)))
+        for lat_r, lon_r, hour, temp, feels, hum in rows
+    }
+
+def save_weather_to_cache(key, weather):
+    """Store a successful lookup so re-runs don't hit the API again"""
+    with closing(_open_weather_cache()) as conn, conn:
+        conn.execute('INSERT OR REPLACE INTO weather_cache VALUES (?, ?, ?, ?, ?, ?)',
+                     (*key, *(weather[col] for col in WEATHER_COLUMNS)))
 
 def get_historical_weather(lat, lon, datetime_str):
     """
     Get historical weather data for a specific location and datetime
     Using OpenWeatherMap One Call API 3.0
     """
-    # Convert datetime string to unix timestamp
-    # Handle both ISO format (2025-07-06T14:30:00Z) and date only
-    if 'T' in datetime_str:
-        # ISO format from Strava - remove Z and T
-        datetime_str = datetime_str.replace('Z', '').replace('T', ' ')
-
-    try:
-        date_obj = datetime.strptime(datetime_str[:19], '%Y-%m-%d %H:%M:%S')
-    except:
-        # Fallback to date only if parsing fails
-        date_obj = datetime.strptime(datetime_str[:10], '%Y-%m-%d')
-
-    timestamp = int(date_obj.timestamp())
+    timestamp = to_unix_timestamp(datetime_str)
     
     # OpenWeatherMap One Call API 3.0 - Historical data
     url = f"https://api.openweathermap.org/data/3.0/onecall/timemachine"
@@ -36,7 +85,7 @@ def get_historical_weather(lat, lon, datetime_str):
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = get_session().get(url, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -60,6 +109,47 @@ def get_historical_weather(lat, lon, datetime_str):
         print(f"Error fetching weather data: {e}")
         return None
 
+def _fetch_and_cache_weather(key, lat, lon, run_datetime):
+    weather = get_historical_weather(lat, lon, run_datetime)
+    if weather:
+        save_weather_to_cache(key, weather)
+    return weather
+
+def fetch_weather_for_runs(runs_with_gps):
+    """
+    Fetch weather for every run, keyed by dataframe index
+    Lookups already in the cache (or shared with an earlier run) skip the API.
+    Calls are still started at most once per REQUEST_INTERVAL_SEC, but they no
+    longer have to finish before the next one is sent
+    """
+    if 'start_datetime' in runs_with_gps.columns:
+        run_datetimes = runs_with_gps['start_datetime']
+    else:
+        run_datetimes = runs_with_gps['date'].astype(str)
+    
+    rows = zip(runs_with_gps.index, runs_with_gps['start_lat'], runs_with_gps['start_lon'],
+               run_datetimes, runs_with_gps['name'])
+    
+    cache = load_weather_cache()
+    row_keys = {}
+    futures = {}
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        for idx, lat, lon, run_datetime, name in rows:
+            key = weather_cache_key(lat, lon, to_unix_timestamp(run_datetime))
+            row_keys[idx] = key
+            if key in cache or key in futures:
+                continue
+            
+            if futures:
+                time.sleep(REQUEST_INTERVAL_SEC)
+            print(f"Getting weather for {run_datetime}: {name}")
+            futures[key] = executor.submit(_fetch_and_cache_weather, key, lat, lon, run_datetime)
+    
+    print(f"Weather API calls: {len(futures)} ({len(row_keys) - len(futures)} runs served from cache)")
+    
+    cache.update({key: future.result() for key, future in futures.items()})
+    return {idx: cache[key] for idx, key in row_keys.items()}
+
 def add_weather_to_running_data():
     """
     Add weather data to existing running data using GPS coordinates
@@ -68,10 +158,9 @@ def add_weather_to_running_data():
     
     # Load enhanced running data
     try:
-        df = pd.read_csv('running_data.csv')
-        df['date'] = pd.to_datetime(df['date'])
+        df = load_data(RUNNING_DATA)
     except FileNotFoundError:
-        print("❌ running_data.csv not found. Run fetch_activities.py first.")
+        print("❌ running_data not found. Run fetch_activities.py first.")
         return None
     
     # Check if we have GPS coordinates
@@ -84,36 +173,31 @@ def add_weather_to_running_data():
     print(f"Found {len(runs_with_gps)} runs with GPS coordinates")
     
     # Add weather data for each run
-    for idx, row in runs_with_gps.iterrows():
-        run_datetime = row.get('start_datetime', row['date'])
-        print(f"Getting weather for {run_datetime}: {row['name']}")
-        
-        weather = get_historical_weather(
-            lat=row['start_lat'],
-            lon=row['start_lon'], 
-            datetime_str=run_datetime
-        )
-        
+    results = fetch_weather_for_runs(runs_with_gps)
+    
+    # Fill whole columns in one go, keeping any existing values where a lookup failed
+    weather_values = df.reindex(columns=WEATHER_COLUMNS).to_numpy(dtype=np.float64, copy=True)
+    positions = df.index.get_indexer(list(results))
+    for pos, weather in zip(positions, results.values()):
         if weather:
-            # Add weather data to the row
-            for key, value in weather.items():
-                df.at[idx, key] = value
-        
-        # Rate limiting - OpenWeatherMap allows 60 calls/minute
-        time.sleep(1.1)  # Just over 1 second between calls
+            weather_values[pos] = [weather[key] for key in WEATHER_COLUMNS]
+    
+    for i, column in enumerate(WEATHER_COLUMNS):
+        df[column] = weather_values[:, i]
     
     # Save enhanced data with weather
-    df.to_csv('running_data.csv', index=False)
-    print(f"\n✅ Weather data added and saved to running_data.csv")
+    save_data(df, RUNNING_DATA)
+    print(f"\n✅ Weather data added and saved to running_data.parquet")
     
     # Print summary
     weather_runs = df[df['temperature_c'].notna()]
     if len(weather_runs) > 0:
+        summary = weather_runs.agg({'temperature_c': ['min', 'max', 'mean'], 'humidity_pct': 'mean'})
         print(f"\nWeather Data Summary:")
         print(f"- Runs with weather data: {len(weather_runs)}")
-        print(f"- Temperature range: {weather_runs['temperature_c'].min():.1f}°C to {weather_runs['temperature_c'].max():.1f}°C")
-        print(f"- Average temperature: {weather_runs['temperature_c'].mean():.1f}°C")
-        print(f"- Average humidity: {weather_runs['humidity_pct'].mean():.1f}%")
+        print(f"- Temperature range: {summary.at['min', 'temperature_c']:.1f}°C to {summary.at['max', 'temperature_c']:.1f}°C")
+        print(f"- Average temperature: {summary.at['mean', 'temperature_c']:.1f}°C")
+        print(f"- Average humidity: {summary.at['mean', 'humidity_pct']:.1f}%")
     
     return df
 
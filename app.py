@@ -1,11 +1,28 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, ctx
 import dash_auth
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from datetime import datetime, timedelta, date
+from functools import lru_cache
+import logging
+import orjson
 import os
+from data_store import CLASSIFIED_RUNNING_DATA, RUNNING_DATA, load_data
+
+# Set DASH_DEBUG=1 for startup diagnostics and per-load details
+DEBUG = bool(os.getenv('DASH_DEBUG'))
+logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
+logger = logging.getLogger(__name__)
+
+if DEBUG:
+    logger.debug("Current directory: %s", os.getcwd())
+    logger.debug("Files in directory: %s", os.listdir('.'))
+
+# Dash serializes callback figures through plotly.io - use orjson, which also encodes NumPy arrays natively
+pio.json.config.default_engine = 'orjson'
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
@@ -32,76 +49,241 @@ COLORS = {
     'grey': '#757575'             # Other
 }
 
+# Shared chart styling - built once at import and reused by every chart
+FONT_FAMILY = '"Open Sans", verdana, arial, sans-serif'
+BASE_LAYOUT = dict(
+    height=450,
+    font=dict(size=13, family=FONT_FAMILY),
+    margin=dict(t=60, b=40, l=40, r=40),
+    plot_bgcolor='#f8f9fa',
+    paper_bgcolor='#f8f9fa'
+)
+TITLE_STYLE = dict(font=dict(size=18, color='#2c3e50'), x=0.5, xanchor='center', pad=dict(t=20, b=20))
+AXIS_TITLE = dict(font=dict(size=14, color='#34495e'))
+
+# Run types in training intensity order
+RUN_TYPE_ORDER = ['Recovery', 'General Aerobic', 'Endurance', 'Lactate Threshold', 'VO₂ Max Intervals', 'Race', 'Other']
+RUN_TYPE_DTYPE = pd.CategoricalDtype(RUN_TYPE_ORDER, ordered=True)
+RUN_TYPE_COLORS = {
+    'Recovery': COLORS['dark_green'],
+    'General Aerobic': COLORS['light_green'],
+    'Endurance': COLORS['yellow'],
+    'Lactate Threshold': COLORS['orange'],
+    'VO₂ Max Intervals': COLORS['red'],
+    'Race': COLORS['race_blue'],
+    'Other': COLORS['grey']
+}
+
+# Columns each chart reads (optional ones may be missing from older data)
+WEEKLY_CHART_COLUMNS = ['date', 'distance_km']
+PACE_CHART_COLUMNS = ['date', 'pace_min_per_km', 'run_type', 'distance_km', 'average_heartrate']
+WEATHER_CHART_COLUMNS = ['date', 'pace_min_per_km', 'feels_like_c']
+PB_CHART_COLUMNS = ['date', '5k_pace_min_per_km', '10k_pace_min_per_km']
+
+# Every column any chart reads - the only ones loaded from disk
+DATA_COLUMNS = list(dict.fromkeys(
+    ['run_type'] + WEEKLY_CHART_COLUMNS + PACE_CHART_COLUMNS + WEATHER_CHART_COLUMNS + PB_CHART_COLUMNS
+))
+
+# Types for the CSV fallback so read_csv doesn't infer them - numbers as float32, run_type in intensity order
+CSV_DTYPES = {column: 'float32' for column in DATA_COLUMNS if column not in ('date', 'run_type')}
+CSV_DTYPES['run_type'] = RUN_TYPE_DTYPE
+
+# Above this many runs the pace chart is downsampled (LTTB) so the browser stays responsive
+MAX_PACE_CHART_POINTS = 5000
+
+# Date range the picker opens with
+DEFAULT_START_DATE = date(2025, 6, 8)
+DEFAULT_END_DATE = date.today()
+
+# Weekly buckets run Monday-Sunday and are labelled by their Monday
+WEEK_BINS = dict(freq='W-MON', label='left', closed='left')
+
+# Cold < 5°C <= Cool < 15°C <= Warm < 25°C <= Hot (feels-like temperature)
+TEMP_BINS = dict(bins=[-np.inf, 5, 15, 25, np.inf], labels=['Cold', 'Cool', 'Warm', 'Hot'], right=False)
+TEMP_COLORS = {'Cold': '#1976D2', 'Cool': '#64B5F6', 'Warm': '#FF9800', 'Hot': '#F44336'}
+
+# Files load_running_data may read from - any change to them invalidates the cache
+DATA_FILES = ['classified_running_data.parquet', 'classified_running_data.csv', 'running_data.parquet', 'running_data.csv']
+
+def _data_file_mtimes():
+    """Modification time of each data file (None if missing)"""
+    mtimes = []
+    for path in DATA_FILES:
+        try:
+            mtimes.append(os.path.getmtime(path))
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
 def load_running_data():
+    """
+    Load running data, reusing the parsed dataframe until a data file changes
+    The returned dataframe is shared between callbacks - copy before modifying it
+    """
+    return _load_running_data_cached(_data_file_mtimes())
+
+@lru_cache(maxsize=2)
+def _load_running_data_cached(mtimes):
     """Load and prepare running data with absolute paths for deployment"""
-    import os
-    
-    # Debug: Print current directory and files
-    print("Current directory:", os.getcwd())
-    print("Files in directory:", os.listdir('.'))
-    
     try:
         # Try direct file names first (Railway should find them in root)
-        df = pd.read_csv('classified_running_data.csv')
-        print(f"Successfully loaded classified_running_data.csv with {len(df)} rows")
+        df = load_data(CLASSIFIED_RUNNING_DATA, columns=DATA_COLUMNS, csv_dtypes=CSV_DTYPES)
+        logger.info("Loaded classified_running_data with %d rows", len(df))
     except FileNotFoundError:
-        print("classified_running_data.csv not found, trying running_data.csv")
+        logger.info("classified_running_data not found, trying running_data")
         try:
-            df = pd.read_csv('running_data.csv')
+            df = load_data(RUNNING_DATA, columns=DATA_COLUMNS, csv_dtypes=CSV_DTYPES)
             df['run_type'] = 'General Aerobic'  # Default classification
-            print(f"Successfully loaded running_data.csv with {len(df)} rows")
+            logger.info("Loaded running_data with %d rows", len(df))
         except FileNotFoundError:
-            print("No CSV files found, creating empty dataframe")
+            logger.warning("No data files found, creating empty dataframe")
             return pd.DataFrame({
                 'date': [], 'distance_km': [], 'pace_min_per_km': [], 'run_type': []
             })
     except Exception as e:
-        print(f"Error loading CSV files: {e}")
+        logger.error("Error loading data files: %s", e)
         return pd.DataFrame({
             'date': [], 'distance_km': [], 'pace_min_per_km': [], 'run_type': []
         })
     
     if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-        print(f"Data processed successfully, date range: {df['date'].min()} to {df['date'].max()}")
-        print(f"Available run types: {df['run_type'].unique().tolist()}")
-        print(f"Available columns: {df.columns.tolist()}")
+        # Sort once and index by date so callbacks can slice and bucket by week directly
+        df = df.sort_values('date').set_index('date', drop=False).rename_axis(None)
+        
+        # Halve the memory every groupby/scan has to move - float32 is plenty for paces, distances,
+        # temps and HR, so chart arithmetic (PB times, weekly sums) stays float32 too.
+        # HR isn't narrowed to uint8: averages have decimals and runs without a monitor are NaN.
+        # CSV data is read as float32 already, this converts Parquet's float64 columns
+        for column in df.select_dtypes('number').columns:
+            df[column] = pd.to_numeric(df[column], downcast='float')
+        
+        # Classified data is read with run_type in this order already - only the default labels need converting
+        if df['run_type'].dtype != RUN_TYPE_DTYPE:
+            df['run_type'] = pd.Categorical(df['run_type'], dtype=RUN_TYPE_DTYPE)
+        if df['run_type'].hasnans:
+            df['run_type'] = df['run_type'].fillna('Other')
+        if 'feels_like_c' in df.columns:
+            df['temp_bin'] = pd.cut(df['feels_like_c'], **TEMP_BINS)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Date range: %s to %s", df['date'].min(), df['date'].max())
+            logger.debug("Available run types: %s", df['run_type'].unique().tolist())
+            logger.debug("Available columns: %s", df.columns.tolist())
     
     return df
 
-def create_weekly_volume_chart(df):
-    """Weekly volume bar chart with race blue color"""
+def weekly_volume(df):
+    """Distance and run count per Monday-Sunday week, indexed by week start (weeks without runs dropped)"""
+    weekly_data = df.groupby(pd.Grouper(**WEEK_BINS)).agg(
+        distance_km=('distance_km', 'sum'),
+        runs_count=('date', 'count')
+    ).rename_axis('week')
+    return weekly_data[weekly_data['runs_count'] > 0]
+
+@lru_cache(maxsize=2)
+def _weekly_volume_cached(mtimes):
+    """Weekly volume over the whole history, grouped once per data load"""
+    df = _load_running_data_cached(mtimes)
     if df.empty:
+        return pd.DataFrame({'distance_km': [], 'runs_count': []})
+    return weekly_volume(df)
+
+def weekly_temp_pace(df):
+    """Mean pace and run count per week and temperature bin (runs without weather data are left out)"""
+    weekly_temp_data = df.groupby([pd.Grouper(**WEEK_BINS), 'temp_bin'], observed=True).agg(
+        pace_min_per_km=('pace_min_per_km', 'mean'),
+        run_count=('date', 'count')
+    ).rename_axis(['week', 'temp_bin'])
+    return weekly_temp_data[weekly_temp_data['run_count'] > 0]
+
+@lru_cache(maxsize=2)
+def _weekly_temp_pace_cached(mtimes):
+    """Weekly pace by temperature over the whole history (None without weather data), grouped once per data load"""
+    df = _load_running_data_cached(mtimes)
+    if 'temp_bin' not in df.columns:
+        return None
+    return weekly_temp_pace(df)
+
+def date_rows(df, start, end):
+    """
+    Row positions of the runs from start to end (inclusive dates) as a slice for iloc
+    df is in date order, so two binary searches on the raw dates find the bounds
+    """
+    dates = df['date'].to_numpy()
+    return slice(dates.searchsorted(start.to_datetime64(), side='left'),
+                 dates.searchsorted((end + pd.Timedelta(days=1)).to_datetime64(), side='left'))
+
+def weekly_in_range(df, weekly_data, start, end, group_weekly):
+    """
+    group_weekly(df) for just the runs between start and end (inclusive dates),
+    given weekly_data = group_weekly(df) over the whole history
+    Whole weeks are sliced from weekly_data - only a part week at either end
+    of the range has to be grouped again from df
+    """
+    start_week = start - pd.Timedelta(days=start.weekday())
+    end_week = end - pd.Timedelta(days=end.weekday())
+    first_full_week = start_week if start.weekday() == 0 else start_week + pd.Timedelta(weeks=1)
+    after_full_weeks = end_week + pd.Timedelta(weeks=1) if end.weekday() == 6 else end_week
+    
+    if first_full_week >= after_full_weeks:
+        return group_weekly(df.iloc[date_rows(df, start, end)])
+    
+    one_day = pd.Timedelta(days=1)
+    return pd.concat([
+        group_weekly(df.iloc[date_rows(df, start, first_full_week - one_day)]),
+        weekly_data.loc[first_full_week:after_full_weeks - one_day],
+        group_weekly(df.iloc[date_rows(df, after_full_weeks, end)])
+    ])
+
+def create_weekly_volume_chart(weekly_data):
+    """Weekly volume bar chart with race blue color"""
+    if weekly_data.empty:
         fig = go.Figure()
         fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False)
         fig.update_layout(height=450, title="Weekly Volume")
         return fig
-        
-    df['week'] = df['date'].dt.to_period('W').dt.start_time
-    weekly_data = df.groupby('week').agg({
-        'distance_km': 'sum',
-        'date': 'count'
-    }).rename(columns={'date': 'runs_count'}).reset_index()
-    
-    fig = px.bar(weekly_data, x='week', y='distance_km',
-                 title='Weekly Volume',
-                 labels={'distance_km': 'Distance (km)', 'week': 'Week'},
-                 hover_data=['runs_count'])
     
-    fig.update_traces(marker_color=COLORS['race_blue'])
+    fig = go.Figure(go.Bar(
+        x=weekly_data.index.to_numpy(), y=weekly_data['distance_km'].to_numpy(),
+        customdata=weekly_data[['runs_count']].to_numpy(),
+        marker_color=COLORS['race_blue'],
+        hovertemplate='Week=%{x}<br>Distance (km)=%{y:.2f}<br>runs_count=%{customdata[0]}<extra></extra>'
+    ))
     
     fig.update_layout(
-        height=450,
-        font=dict(size=13, family='"Open Sans", verdana, arial, sans-serif'),
-        title=dict(font=dict(size=18, color='#2c3e50'), x=0.5, xanchor='center', pad=dict(t=20, b=20)),
-        xaxis=dict(title=dict(font=dict(size=14, color='#34495e'))),
-        yaxis=dict(title=dict(font=dict(size=14, color='#34495e'))),
-        margin=dict(t=60, b=40, l=40, r=40),
-        plot_bgcolor='#f8f9fa',
-        paper_bgcolor='#f8f9fa'
+        **BASE_LAYOUT, title=dict(text='Weekly Volume', **TITLE_STYLE),
+        xaxis=dict(title=dict(text='Week', **AXIS_TITLE)),
+        yaxis=dict(title=dict(text='Distance (km)', **AXIS_TITLE))
     )
     return fig
 
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the n_out points Largest-Triangle-Three-Buckets keeps from (x, y)
+    The first and last points are always kept, plus the most prominent point of each bucket between
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    edges = np.append(edges, n)
+    
+    kept = np.empty(n_out, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[end:edges[i + 2]].mean()
+        next_y = y[end:edges[i + 2]].mean()
+        area = np.abs((x[prev] - next_x) * (y[start:end] - y[prev]) -
+                      (x[prev] - x[start:end]) * (next_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        kept[i + 1] = prev
+    return kept
+
 def create_pace_trend_chart(df):
     """Pace trends by run type with training intensity order - robust for missing run types"""
     if df.empty:
@@ -110,124 +292,97 @@ def create_pace_trend_chart(df):
         fig.update_layout(height=450, title="Pace Trends by Run Type")
         return fig
         
-    # Define run type colors (complete mapping)
-    run_type_colors = {
-        'Recovery': COLORS['dark_green'],
-        'General Aerobic': COLORS['light_green'],
-        'Endurance': COLORS['yellow'],
-        'Lactate Threshold': COLORS['orange'],
-        'VO₂ Max Intervals': COLORS['red'],
-        'Race': COLORS['race_blue'],
-        'Other': COLORS['grey']
-    }
-    
-    # Define full intensity order but only use existing run types
-    full_intensity_order = ['Recovery', 'General Aerobic', 'Endurance', 'Lactate Threshold', 'VO₂ Max Intervals', 'Race', 'Other']
-    existing_run_types = df['run_type'].unique()
-    intensity_order = [rt for rt in full_intensity_order if rt in existing_run_types]
-    
-    # Only create categorical if we have run types
-    if len(intensity_order) > 0:
-        df['run_type'] = pd.Categorical(df['run_type'], categories=intensity_order, ordered=True)
-    
-    # Filter colors to only existing run types
-    existing_colors = {rt: run_type_colors[rt] for rt in existing_run_types if rt in run_type_colors}
-    
-    fig = px.scatter(df, x='date', y='pace_min_per_km',
-                     color='run_type',
-                     color_discrete_map=existing_colors,
-                     category_orders={'run_type': intensity_order} if len(intensity_order) > 0 else None,
-                     hover_data=['distance_km', 'average_heartrate'] if 'average_heartrate' in df.columns else ['distance_km'],
-                     title='Pace Trends by Run Type',
-                     labels={'pace_min_per_km': 'Pace (min/km)', 'date': 'Date'})
-    
-    fig.update_yaxes(range=[3.5, None])
-    
     # Update hover template based on available columns
     if 'average_heartrate' in df.columns:
-        hover_template = '<b>Date:</b> %{x}<br><b>Pace:</b> %{y} min/km<br><b>Distance:</b> %{customdata[0]} km<br><b>Average Heart Rate:</b> %{customdata[1]} bpm<br><extra></extra>'
+        hover_columns = ['distance_km', 'average_heartrate']
+        hover_template = '<b>Date:</b> %{x}<br><b>Pace:</b> %{y:.2f} min/km<br><b>Distance:</b> %{customdata[0]:.2f} km<br><b>Average Heart Rate:</b> %{customdata[1]:.1f} bpm<br><extra></extra>'
     else:
-        hover_template = '<b>Date:</b> %{x}<br><b>Pace:</b> %{y} min/km<br><b>Distance:</b> %{customdata[0]} km<br><extra></extra>'
+        hover_columns = ['distance_km']
+        hover_template = '<b>Date:</b> %{x}<br><b>Pace:</b> %{y:.2f} min/km<br><b>Distance:</b> %{customdata[0]:.2f} km<br><extra></extra>'
     
-    fig.update_traces(
-        hovertemplate=hover_template,
-        marker=dict(size=12)
-    )
+    # One WebGL trace per run type - run_type is an ordered categorical, so the legend follows intensity
+    fig = go.Figure()
+    for run_type in df['run_type'].cat.categories:
+        runs = df[df['run_type'] == run_type]
+        if runs.empty:
+            continue
+        if len(df) > MAX_PACE_CHART_POINTS:
+            # Each run type keeps its share of the point budget
+            n_out = max(3, len(runs) * MAX_PACE_CHART_POINTS // len(df))
+            days = (runs['date'] - runs['date'].iloc[0]) / pd.Timedelta(days=1)
+            runs = runs.iloc[lttb_indices(days, runs['pace_min_per_km'], n_out)]
+        fig.add_trace(go.Scattergl(
+            x=runs['date'].to_numpy(), y=runs['pace_min_per_km'].to_numpy(),
+            mode='markers', name=run_type,
+            marker=dict(color=RUN_TYPE_COLORS[run_type], size=12),
+            customdata=runs[hover_columns].to_numpy(),
+            hovertemplate=hover_template
+        ))
     
     fig.update_layout(
-        height=450,
-        font=dict(size=13, family='"Open Sans", verdana, arial, sans-serif'),
-        title=dict(font=dict(size=18, color='#2c3e50'), x=0.5, xanchor='center', pad=dict(t=20, b=20)),
-        xaxis=dict(title=dict(font=dict(size=14, color='#34495e'))),
-        yaxis=dict(title=dict(font=dict(size=14, color='#34495e'))),
-        legend=dict(font=dict(size=12)),
-        margin=dict(t=60, b=40, l=40, r=40),
-        plot_bgcolor='#f8f9fa',
-        paper_bgcolor='#f8f9fa'
+        **BASE_LAYOUT, title=dict(text='Pace Trends by Run Type', **TITLE_STYLE),
+        xaxis=dict(title=dict(text='Date', **AXIS_TITLE)),
+        yaxis=dict(title=dict(text='Pace (min/km)', **AXIS_TITLE), range=[3.5, None]),
+        legend=dict(font=dict(size=12), title=dict(text='run_type'))
     )
     return fig
 
-def create_weather_impact_chart(df):
+def create_weather_impact_chart(weekly_temp_data):
     """Weather impact bar chart by temperature bins - robust for missing weather data"""
-    if df.empty or 'feels_like_c' not in df.columns:
+    if weekly_temp_data is None:
         fig = go.Figure()
         fig.add_annotation(text="No weather data available", x=0.5, y=0.5, showarrow=False)
         fig.update_layout(height=450, title="Pace by Weather Conditions", 
                          plot_bgcolor='#f8f9fa', paper_bgcolor='#f8f9fa')
         return fig
-        
-    all_runs = df.dropna(subset=['feels_like_c'])
-    
-    if len(all_runs) == 0:
-        fig = go.Figure()
-        fig.add_annotation(text="No weather data available for runs", x=0.5, y=0.5, showarrow=False)
-        fig.update_layout(height=450, title="Pace by Weather Conditions", 
-                         plot_bgcolor='#f8f9fa', paper_bgcolor='#f8f9fa')
-        return fig
     
-    def get_temp_bin(temp):
-        if temp < 5: return 'Cold'
-        elif temp < 15: return 'Cool'
-        elif temp < 25: return 'Warm'
-        else: return 'Hot'
-    
-    all_runs['temp_bin'] = all_runs['feels_like_c'].apply(get_temp_bin)
-    all_runs['week'] = all_runs['date'].dt.to_period('W').dt.start_time
-    
-    weekly_temp_data = all_runs.groupby(['week', 'temp_bin']).agg({
-        'pace_min_per_km': 'mean',
-        'date': 'count'
-    }).rename(columns={'date': 'run_count'}).reset_index()
-    
-    # Check if we have any data after grouping
     if len(weekly_temp_data) == 0:
         fig = go.Figure()
-        fig.add_annotation(text="No sufficient weather data for analysis", x=0.5, y=0.5, showarrow=False)
+        fig.add_annotation(text="No weather data available for runs", x=0.5, y=0.5, showarrow=False)
         fig.update_layout(height=450, title="Pace by Weather Conditions", 
                          plot_bgcolor='#f8f9fa', paper_bgcolor='#f8f9fa')
         return fig
     
-    temp_colors = {'Cold': '#1976D2', 'Cool': '#64B5F6', 'Warm': '#FF9800', 'Hot': '#F44336'}
+    weekly_temp_data = weekly_temp_data.reset_index()
     
-    fig = px.bar(weekly_temp_data, x='week', y='pace_min_per_km', 
-                 color='temp_bin', color_discrete_map=temp_colors,
-                 title='Pace by Weather Conditions',
-                 labels={'pace_min_per_km': 'Average Pace (min/km)', 'week': 'Week', 'temp_bin': 'Temperature'},
-                 hover_data=['run_count'], barmode='group')
+    # One bar trace per temperature bin, coldest first
+    fig = go.Figure()
+    for temp_bin in TEMP_BINS['labels']:
+        bin_data = weekly_temp_data[weekly_temp_data['temp_bin'] == temp_bin]
+        if len(bin_data) == 0:
+            continue
+        fig.add_trace(go.Bar(
+            x=bin_data['week'].to_numpy(), y=bin_data['pace_min_per_km'].to_numpy(),
+            name=temp_bin, marker_color=TEMP_COLORS[temp_bin],
+            customdata=bin_data[['run_count']].to_numpy(),
+            hovertemplate=f'Temperature={temp_bin}<br>Week=%{{x}}<br>Average Pace (min/km)=%{{y:.2f}}<br>run_count=%{{customdata[0]}}<extra></extra>'
+        ))
     
     fig.update_layout(
-        height=450,
-        font=dict(size=13, family='"Open Sans", verdana, arial, sans-serif'),
-        title=dict(font=dict(size=18, color='#2c3e50'), x=0.5, xanchor='center', pad=dict(t=20, b=20)),
-        xaxis=dict(title=dict(font=dict(size=14, color='#34495e'))),
-        yaxis=dict(title=dict(font=dict(size=14, color='#34495e'))),
-        legend=dict(font=dict(size=12), title=dict(text='Temperature')),
-        margin=dict(t=60, b=40, l=40, r=40),
-        plot_bgcolor='#f8f9fa',
-        paper_bgcolor='#f8f9fa'
+        **BASE_LAYOUT, barmode='group',
+        title=dict(text='Pace by Weather Conditions', **TITLE_STYLE),
+        xaxis=dict(title=dict(text='Week', **AXIS_TITLE)),
+        yaxis=dict(title=dict(text='Average Pace (min/km)', **AXIS_TITLE)),
+        legend=dict(font=dict(size=12), title=dict(text='Temperature'))
     )
     return fig
 
+def cumulative_pb(df, pace_column):
+    """
+    Dates and best-pace-so-far for the runs that have a pace_column best effort,
+    reduced to the runs that set a new PB (plus the latest run, so the line reaches it)
+    Relies on df being in date order, as load_running_data returns it
+    """
+    mask = df[pace_column].notna().to_numpy()
+    dates = df['date'].to_numpy()[mask]
+    pb = np.minimum.accumulate(df[pace_column].to_numpy()[mask])
+    
+    steps = np.empty(len(pb), dtype=bool)
+    steps[:1] = True
+    steps[1:] = pb[1:] != pb[:-1]
+    steps[-1:] = True
+    return dates[steps], pb[steps]
+
 def create_pb_tracking_chart(df):
     """PB tracking with 10K and 5K lines - robust for missing PB data"""
     if df.empty:
@@ -249,36 +404,30 @@ def create_pb_tracking_chart(df):
     
     # 10K PBs first in legend
     if '10k_pace_min_per_km' in df.columns:
-        tenK_data = df[df['10k_pace_min_per_km'].notna()].copy()
-        if len(tenK_data) > 0:
+        tenK_dates, tenK_pb = cumulative_pb(df, '10k_pace_min_per_km')
+        if len(tenK_pb) > 0:
             has_data = True
-            tenK_data = tenK_data.sort_values('date')
-            tenK_data['pb_pace'] = tenK_data['10k_pace_min_per_km'].cummin()
-            tenK_data['race_time_min'] = tenK_data['pb_pace'] * 10
             
             fig.add_trace(go.Scatter(
-                x=tenK_data['date'], y=tenK_data['pb_pace'],
-                mode='lines+markers', name='10K PB',
+                x=tenK_dates, y=tenK_pb,
+                mode='lines+markers', name='10K PB', line_shape='hv',
                 line=dict(color=COLORS['dark_blue'], width=3), marker=dict(size=8),
                 hovertemplate='<b>10K PB</b><br>Date: %{x}<br>Pace: %{y:.2f} min/km<br>Time: %{customdata:.1f} minutes<br><extra></extra>',
-                customdata=tenK_data['race_time_min']
+                customdata=tenK_pb * 10
             ))
     
     # 5K PBs second in legend
     if '5k_pace_min_per_km' in df.columns:
-        fiveK_data = df[df['5k_pace_min_per_km'].notna()].copy()
-        if len(fiveK_data) > 0:
+        fiveK_dates, fiveK_pb = cumulative_pb(df, '5k_pace_min_per_km')
+        if len(fiveK_pb) > 0:
             has_data = True
-            fiveK_data = fiveK_data.sort_values('date')
-            fiveK_data['pb_pace'] = fiveK_data['5k_pace_min_per_km'].cummin()
-            fiveK_data['race_time_min'] = fiveK_data['pb_pace'] * 5
             
             fig.add_trace(go.Scatter(
-                x=fiveK_data['date'], y=fiveK_data['pb_pace'],
-                mode='lines+markers', name='5K PB',
+                x=fiveK_dates, y=fiveK_pb,
+                mode='lines+markers', name='5K PB', line_shape='hv',
                 line=dict(color=COLORS['race_blue'], width=3), marker=dict(size=8),
                 hovertemplate='<b>5K PB</b><br>Date: %{x}<br>Pace: %{y:.2f} min/km<br>Time: %{customdata:.1f} minutes<br><extra></extra>',
-                customdata=fiveK_data['race_time_min']
+                customdata=fiveK_pb * 5
             ))
     
     # If no PB data found, show message
@@ -286,15 +435,11 @@ def create_pb_tracking_chart(df):
         fig.add_annotation(text="No PB data available yet", x=0.5, y=0.5, showarrow=False)
     
     fig.update_layout(
-        xaxis_title='Date', yaxis_title='Pace (min/km)', height=450, hovermode='x unified',
-        font=dict(size=13, family='"Open Sans", verdana, arial, sans-serif'),
-        title=dict(text='PB Tracking', font=dict(size=18, color='#2c3e50'), x=0.5, xanchor='center', pad=dict(t=20, b=20)),
-        xaxis=dict(title_font=dict(size=14, color='#34495e')),
-        yaxis=dict(title_font=dict(size=14, color='#34495e')),
-        legend=dict(font=dict(size=12)),
-        margin=dict(t=60, b=40, l=40, r=40),
-        plot_bgcolor='#f8f9fa',
-        paper_bgcolor='#f8f9fa'
+        **BASE_LAYOUT, hovermode='x unified',
+        title=dict(text='PB Tracking', **TITLE_STYLE),
+        xaxis=dict(title=dict(text='Date', **AXIS_TITLE)),
+        yaxis=dict(title=dict(text='Pace (min/km)', **AXIS_TITLE)),
+        legend=dict(font=dict(size=12))
     )
     return fig
 
@@ -303,7 +448,7 @@ app.layout = html.Div([
     html.Div([
         html.H1("Strava Running Dashboard", 
                 style={'text-align': 'center', 'color': '#2c3e50', 'margin-bottom': '40px',
-                       'font-family': '"Open Sans", verdana, arial, sans-serif'}),
+                       'font-family': FONT_FAMILY}),
         
         # Control Panel
         html.Div([
@@ -312,7 +457,7 @@ app.layout = html.Div([
                            style={'background-color': '#2196F3', 'color': 'white', 
                                   'border': 'none', 'padding': '12px 24px', 
                                   'border-radius': '6px', 'cursor': 'pointer',
-                                  'font-family': '"Open Sans", verdana, arial, sans-serif',
+                                  'font-family': FONT_FAMILY,
                                   'font-size': '14px', 'font-weight': '500',
                                   'box-shadow': '0 2px 4px rgba(0,0,0,0.1)',
                                   'transition': 'all 0.2s ease'})
@@ -321,14 +466,14 @@ app.layout = html.Div([
             html.Div([
                 html.Label("Select Date Range:", 
                           style={'font-weight': 'bold', 'margin-right': '15px', 'color': '#2c3e50',
-                                 'font-family': '"Open Sans", verdana, arial, sans-serif',
+                                 'font-family': FONT_FAMILY,
                                  'font-size': '14px'}),
                 dcc.DatePickerRange(
                     id='date-range-picker',
-                    start_date=date(2025, 6, 8),
-                    end_date=date.today(),
+                    start_date=DEFAULT_START_DATE,
+                    end_date=DEFAULT_END_DATE,
                     display_format='YYYY-MM-DD',
-                    style={'font-family': '"Open Sans", verdana, arial, sans-serif',
+                    style={'font-family': FONT_FAMILY,
                            'background-color': '#2196F3', 'color': 'white',
                            'border': 'none', 'border-radius': '6px',
                            'font-size': '14px', 'font-weight': '500'}
@@ -359,17 +504,56 @@ app.layout = html.Div([
 )
 def update_dashboard(n_clicks, start_date, end_date):
     """Update all dashboard components based on date range"""
-    df = load_running_data()
+    # Refresh always re-reads from disk, other changes reuse the cached data
+    if ctx.triggered_id == 'refresh-btn':
+        _load_running_data_cached.cache_clear()
+        _weekly_volume_cached.cache_clear()
+        _weekly_temp_pace_cached.cache_clear()
+        make_figures.cache_clear()
+    
+    return make_figures(start_date, end_date, _data_file_mtimes())
+
+@lru_cache(maxsize=32)
+def make_figures(start_date, end_date, mtimes):
+    """Build all four charts for a date range - cached until a data file changes"""
+    df = _load_running_data_cached(mtimes)
+    weekly_data = _weekly_volume_cached(mtimes)
+    weekly_temp_data = _weekly_temp_pace_cached(mtimes)
     
+    rows = slice(None)
     if not df.empty and start_date and end_date:
-        df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        weekly_data = weekly_in_range(df, weekly_data, start, end, weekly_volume)
+        if weekly_temp_data is not None:
+            weekly_temp_data = weekly_in_range(df, weekly_temp_data, start, end, weekly_temp_pace)
+        rows = date_rows(df, start, end)
     
-    return (
-        create_weekly_volume_chart(df),
-        create_pace_trend_chart(df),
-        create_weather_impact_chart(df),
-        create_pb_tracking_chart(df)
+    # Weekly charts get their pre-grouped tables, the others just the rows
+    # and columns they read, copied out of the cached data in one step
+    figures = (
+        create_weekly_volume_chart(weekly_data),
+        create_pace_trend_chart(select_columns(df, PACE_CHART_COLUMNS, rows)),
+        create_weather_impact_chart(weekly_temp_data),
+        create_pb_tracking_chart(select_columns(df, PB_CHART_COLUMNS, rows))
     )
+    return tuple(figure_json(fig) for fig in figures)
+
+def figure_json(fig):
+    """
+    Figure serialized once to plain JSON data - cache hits then hand Dash lists and dicts
+    instead of re-encoding the figure's arrays and dates on every callback
+    """
+    return orjson.loads(pio.to_json(fig, validate=False))
+
+def select_columns(df, columns, rows=slice(None)):
+    """df.iloc[rows] with whichever of columns df has"""
+    return df.iloc[rows, df.columns.get_indexer([column for column in columns if column in df.columns])]
+
+# Load the data and build the opening date range's charts at startup,
+# so the first page view is served straight from the caches.
+# gunicorn runs with --preload (see Procfile), so this happens once in the master
+# and every worker starts with the caches already filled (shared copy-on-write)
+make_figures(DEFAULT_START_DATE.isoformat(), DEFAULT_END_DATE.isoformat(), _data_file_mtimes())
 
 # For deployment
 if __name__ == '__main__':
@@ -1,9 +1,13 @@
 import dash
 from dash import dcc, html, Input, Output, callback
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, date
+from functools import lru_cache
+import os
+from data_store import CLASSIFIED_RUNNING_DATA, RUNNING_DATA, load_data
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
@@ -20,22 +24,72 @@ COLORS = {
     'grey': '#757575'             # Other
 }
 
+# Colors for each run type using our palette - IN TRAINING INTENSITY ORDER
+RUN_TYPE_COLORS = {
+    'Recovery': COLORS['dark_green'],
+    'General Aerobic': COLORS['light_green'],
+    'Endurance': COLORS['yellow'],
+    'Lactate Threshold': COLORS['orange'],
+    'VO₂ Max Intervals': COLORS['red'],
+    'Race': COLORS['race_blue'],  # Changed to blue
+    'Other': COLORS['grey']
+}
+
+# Temperature bin colors
+TEMP_COLORS = {
+    'Cold': '#1976D2',      # Blue
+    'Cool': '#64B5F6',      # Light blue
+    'Warm': '#FF9800',      # Orange
+    'Hot': '#F44336'        # Red
+}
+
+# Files load_running_data may read from - any change to them invalidates the cache
+DATA_FILES = ['classified_running_data.parquet', 'classified_running_data.csv', 'running_data.parquet', 'running_data.csv']
+
+def _data_file_mtimes():
+    """Modification time of each data file (None if missing)"""
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in DATA_FILES)
+
+# Run types in training intensity order
+RUN_TYPE_ORDER = ['Recovery', 'General Aerobic', 'Endurance', 'Lactate Threshold', 'VO₂ Max Intervals', 'Race', 'Other']
+RUN_TYPE_DTYPE = pd.CategoricalDtype(RUN_TYPE_ORDER, ordered=True)
+
 def load_running_data():
+    """
+    Load running data, reusing the parsed dataframe until a data file changes
+    The returned dataframe is shared between callbacks - copy before modifying it
+    """
+    return _load_running_data_cached(_data_file_mtimes())
+
+@lru_cache(maxsize=2)
+def _load_running_data_cached(mtimes):
     """Load and prepare running data with classifications"""
     try:
-        df = pd.read_csv('classified_running_data.csv')
+        df = load_data(CLASSIFIED_RUNNING_DATA)
     except FileNotFoundError:
         # Fallback to regular data if classified version doesn't exist
-        df = pd.read_csv('running_data.csv')
+        df = load_data(RUNNING_DATA)
         df['run_type'] = 'General Aerobic'  # Default classification
     
-    df['date'] = pd.to_datetime(df['date'])
+    # Sort once and index by date so callbacks can slice a date range directly
+    df = df.sort_values('date').set_index('date', drop=False).rename_axis(None)
+    
+    # Classified Parquet already stores run_type in intensity order - only CSV data needs converting
+    if df['run_type'].dtype != RUN_TYPE_DTYPE:
+        df['run_type'] = pd.Categorical(df['run_type'], dtype=RUN_TYPE_DTYPE)
+    
     return df  # Return all data, filtering will happen in callbacks
 
+def week_start(dates):
+    """Monday of each date's week - same as .dt.to_period('W').dt.start_time without building Periods"""
+    days = dates.to_numpy().astype('datetime64[D]')
+    # Day 0 (1970-01-01) was a Thursday, so Mondays are the days where (day - 4) % 7 == 0
+    weekday = ((days.view('i8') - 4) % 7).astype('timedelta64[D]')
+    return pd.Series((days - weekday).astype('datetime64[ns]'), index=dates.index)
+
 def create_weekly_volume_chart(df):
     """05.01: Weekly KMs bar chart"""
-    df['week'] = df['date'].dt.to_period('W').dt.start_time
-    weekly_data = df.groupby('week').agg({
+    weekly_data = df.groupby(week_start(df['date']).rename('week')).agg({
         'distance_km': 'sum',
         'date': 'count'
     }).rename(columns={'date': 'runs_count'}).reset_index()
@@ -69,28 +123,15 @@ def create_weekly_volume_chart(df):
 
 def create_pace_trend_chart(df):
     """05.02: Pace trend scatter chart with run_type color coding"""
-    # Define colors for each run type using our palette - IN TRAINING INTENSITY ORDER
-    run_type_colors = {
-        'Recovery': COLORS['dark_green'],
-        'General Aerobic': COLORS['light_green'],
-        'Endurance': COLORS['yellow'],
-        'Lactate Threshold': COLORS['orange'],
-        'VO₂ Max Intervals': COLORS['red'],
-        'Race': COLORS['race_blue'],  # Changed to blue
-        'Other': COLORS['grey']
-    }
-    
-    # Ensure run_type is categorical with correct order for legend
-    intensity_order = ['Recovery', 'General Aerobic', 'Endurance', 'Lactate Threshold', 'VO₂ Max Intervals', 'Race', 'Other']
-    df['run_type'] = pd.Categorical(df['run_type'], categories=intensity_order, ordered=True)
-    
+    # run_type is loaded as an ordered categorical - px can't draw run types with no runs in the range,
+    # so it gets them trimmed as a separate series (px calls that 'color') rather than changing df
     fig = px.scatter(df, x='date', y='pace_min_per_km',
-                     color='run_type',
-                     color_discrete_map=run_type_colors,
-                     category_orders={'run_type': intensity_order},
+                     color=df['run_type'].cat.remove_unused_categories(),
+                     color_discrete_map=RUN_TYPE_COLORS,
+                     category_orders={'color': RUN_TYPE_ORDER},
                      hover_data=['distance_km', 'average_heartrate'],
                      title='Pace Trends by Run Type',
-                     labels={'pace_min_per_km': 'Pace (min/km)', 'date': 'Date'})
+                     labels={'pace_min_per_km': 'Pace (min/km)', 'date': 'Date', 'color': 'run_type'})
     
     # Set y-axis to start at 3:30
     fig.update_yaxes(range=[3.5, None])
@@ -128,9 +169,7 @@ def create_pace_trend_chart(df):
 def create_weather_impact_chart(df):
     """05.03: Weather impact - weekly grouped bar chart by temperature bins for all runs"""
     # Use all runs, not just General Aerobic
-    all_runs = df.copy()
-    
-    if len(all_runs) == 0 or 'feels_like_c' not in all_runs.columns:
+    if len(df) == 0 or 'feels_like_c' not in df.columns:
         # Create empty chart if no data
         fig = go.Figure()
         fig.add_annotation(text="No runs with weather data", 
@@ -153,7 +192,7 @@ def create_weather_impact_chart(df):
         return fig
     
     # Remove runs without weather data
-    all_runs = all_runs.dropna(subset=['feels_like_c'])
+    all_runs = df.dropna(subset=['feels_like_c'])
     
     if len(all_runs) == 0:
         fig = go.Figure()
@@ -176,38 +215,24 @@ def create_weather_impact_chart(df):
         )
         return fig
     
-    # Create temperature bins
-    def get_temp_bin(temp):
-        if temp < 5:
-            return 'Cold'
-        elif temp < 15:
-            return 'Cool'
-        elif temp < 25:
-            return 'Warm'
-        else:
-            return 'Hot'
-    
-    all_runs['temp_bin'] = all_runs['feels_like_c'].apply(get_temp_bin)
-    all_runs['week'] = all_runs['date'].dt.to_period('W').dt.start_time
+    # Create temperature bins: Cold < 5°C <= Cool < 15°C <= Warm < 25°C <= Hot
+    temp_bin = pd.cut(all_runs['feels_like_c'], bins=[-np.inf, 5, 15, 25, np.inf],
+                      labels=['Cold', 'Cool', 'Warm', 'Hot'], right=False).rename('temp_bin')
+    week = week_start(all_runs['date']).rename('week')
     
     # Group by week and temperature bin, calculate average pace
-    weekly_temp_data = all_runs.groupby(['week', 'temp_bin']).agg({
+    weekly_temp_data = all_runs.groupby([week, temp_bin], observed=True).agg({
         'pace_min_per_km': 'mean',
         'date': 'count'
     }).rename(columns={'date': 'run_count'}).reset_index()
-    
-    # Temperature bin colors
-    temp_colors = {
-        'Cold': '#1976D2',      # Blue
-        'Cool': '#64B5F6',      # Light blue
-        'Warm': '#FF9800',      # Orange
-        'Hot': '#F44336'        # Red
-    }
+    # px can't draw categories with no rows
+    weekly_temp_data['temp_bin'] = weekly_temp_data['temp_bin'].cat.remove_unused_categories()
     
     # Create grouped bar chart
     fig = px.bar(weekly_temp_data, x='week', y='pace_min_per_km', 
                  color='temp_bin',
-                 color_discrete_map=temp_colors,
+                 color_discrete_map=TEMP_COLORS,
+                 category_orders={'temp_bin': list(weekly_temp_data['temp_bin'].cat.categories)},
                  title='Pace by Weather Conditions',
                  labels={'pace_min_per_km': 'Average Pace (min/km)', 'week': 'Week', 'temp_bin': 'Temperature'},
                  hover_data=['run_count'],
@@ -261,18 +286,15 @@ def create_pb_tracking_chart(df):
     
     # Process 10K PBs FIRST (so it appears first in legend)
     if '10k_pace_min_per_km' in df.columns:
-        tenK_data = df[df['10k_pace_min_per_km'].notna()].copy()
-        if len(tenK_data) > 0:
-            # Calculate cumulative PB (best pace so far)
-            tenK_data = tenK_data.sort_values('date')
-            tenK_data['pb_pace'] = tenK_data['10k_pace_min_per_km'].cummin()
-            
-            # Convert pace to time for hover
-            tenK_data['race_time_min'] = tenK_data['pb_pace'] * 10
+        # Calculate cumulative PB (best pace so far) - df is already in date order
+        has_effort = df['10k_pace_min_per_km'].notna().to_numpy()
+        tenK_dates = df['date'].to_numpy()[has_effort]
+        tenK_pb = np.minimum.accumulate(df['10k_pace_min_per_km'].to_numpy()[has_effort])
+        if len(tenK_pb) > 0:
             
             fig.add_trace(go.Scatter(
-                x=tenK_data['date'],
-                y=tenK_data['pb_pace'],
+                x=tenK_dates,
+                y=tenK_pb,
                 mode='lines+markers',
                 name='10K PB',
                 line=dict(color=COLORS['dark_blue'], width=3),
@@ -282,23 +304,20 @@ def create_pb_tracking_chart(df):
                              'Pace: %{y:.2f} min/km<br>' +
                              'Time: %{customdata:.1f} minutes<br>' +
                              '<extra></extra>',
-                customdata=tenK_data['race_time_min']
+                customdata=tenK_pb * 10  # Convert pace to time for hover
             ))
     
     # Process 5K PBs SECOND (so it appears second in legend)
     if '5k_pace_min_per_km' in df.columns:
-        fiveK_data = df[df['5k_pace_min_per_km'].notna()].copy()
-        if len(fiveK_data) > 0:
-            # Calculate cumulative PB (best pace so far)
-            fiveK_data = fiveK_data.sort_values('date')
-            fiveK_data['pb_pace'] = fiveK_data['5k_pace_min_per_km'].cummin()
-            
-            # Convert pace to time for hover
-            fiveK_data['race_time_min'] = fiveK_data['pb_pace'] * 5
+        # Calculate cumulative PB (best pace so far) - df is already in date order
+        has_effort = df['5k_pace_min_per_km'].notna().to_numpy()
+        fiveK_dates = df['date'].to_numpy()[has_effort]
+        fiveK_pb = np.minimum.accumulate(df['5k_pace_min_per_km'].to_numpy()[has_effort])
+        if len(fiveK_pb) > 0:
             
             fig.add_trace(go.Scatter(
-                x=fiveK_data['date'],
-                y=fiveK_data['pb_pace'],
+                x=fiveK_dates,
+                y=fiveK_pb,
                 mode='lines+markers',
                 name='5K PB',
                 line=dict(color=COLORS['race_blue'], width=3),
@@ -308,7 +327,7 @@ def create_pb_tracking_chart(df):
                              'Pace: %{y:.2f} min/km<br>' +
                              'Time: %{customdata:.1f} minutes<br>' +
                              '<extra></extra>',
-                customdata=fiveK_data['race_time_min']
+                customdata=fiveK_pb * 5  # Convert pace to time for hover
             ))
     
     # Professional styling with light background
@@ -407,12 +426,13 @@ app.layout = html.Div([
 )
 def update_dashboard(n_clicks, start_date, end_date):
     """Update all dashboard components based on date range"""
-    # Load fresh data (from CSV only - no API calls)
+    # Load data (from disk only - no API calls), re-read only when a data file has changed
     df = load_running_data()
     
-    # Filter data based on selected date range
+    # Filter data based on selected date range - the charts only read their input,
+    # so they can all share this slice of the cached data
     if start_date and end_date:
-        df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+        df = df.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
     
     # Create all charts with filtered data
     weekly_fig = create_weekly_volume_chart(df)
@@ -0,0 +1,35 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Parquet is the primary store - keeps dtypes and reads much faster than CSV
+# A CSV copy is still written so the data can be inspected by eye
+SAVE_CSV_COPY = True
+
+RUNNING_DATA = 'running_data'
+CLASSIFIED_RUNNING_DATA = 'classified_running_data'
+
+def save_data(df, name):
+    """Save a dataframe as <name>.parquet (plus <name>.csv if SAVE_CSV_COPY is on)"""
+    df.to_parquet(f'{name}.parquet', index=False, compression='zstd', compression_level=3)
+
+    if SAVE_CSV_COPY:
+        df.to_csv(f'{name}.csv', index=False)
+
+def load_data(name, columns=None, csv_dtypes=None):
+    """
+    Load <name>.parquet, falling back to <name>.csv for data saved before the switch
+    If columns is given only those columns are read - any the file doesn't have are skipped
+    csv_dtypes ({column: dtype}) saves read_csv inferring types - Parquet already stores them
+    Raises FileNotFoundError if neither file exists
+    """
+    try:
+        if columns is not None:
+            available = set(pq.read_schema(f'{name}.parquet').names)
+            columns = [column for column in columns if column in available]
+        return pd.read_parquet(f'{name}.parquet', columns=columns)
+    except FileNotFoundError:
+        # Dates are parsed while reading, if the file has a date column (and it is wanted)
+        header = pd.read_csv(f'{name}.csv', nrows=0).columns
+        parse_dates = ['date'] if 'date' in header and (columns is None or 'date' in columns) else False
+        usecols = None if columns is None else (lambda column: column in columns)
+        return pd.read_csv(f'{name}.csv', usecols=usecols, dtype=csv_dtypes, parse_dates=parse_dates)
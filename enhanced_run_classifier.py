@@ -1,7 +1,14 @@
 import pandas as pd
 import numpy as np
+from data_store import CLASSIFIED_RUNNING_DATA, RUNNING_DATA, load_data, save_data
 
 class PfitzRunClassifier:
+    # Run types in training intensity order (the category order of run_type)
+    RUN_TYPES = ['Recovery', 'General Aerobic', 'Endurance', 'Lactate Threshold', 'VO₂ Max Intervals', 'Race', 'Other']
+    
+    # Run types in classification priority order - the first matching rule wins
+    RUN_TYPE_PRIORITY = ['Race', 'VO₂ Max Intervals', 'Lactate Threshold', 'Recovery', 'Endurance', 'General Aerobic']
+    
     def __init__(self, max_hr=191):
         self.max_hr = max_hr
         
@@ -34,101 +41,50 @@ class PfitzRunClassifier:
         print(f"- Tracked 5K best: {self.tracked_pb_5k_pace:.2f} min/km" if self.tracked_pb_5k_pace else "- Tracked 5K best: Not available")
         print(f"- Tracked 10K best: {self.tracked_pb_10k_pace:.2f} min/km" if self.tracked_pb_10k_pace else "- Tracked 10K best: Not available")
         
-    def classify_run(self, row):
-        """Classify a single run based on improved Pfitzinger framework"""
-        distance_km = row['distance_km']
-        pace_min_per_km = row['pace_min_per_km']
-        avg_hr = row.get('average_heartrate', 0)
-        max_hr_run = row.get('max_heartrate', 0)
-        duration_min = row['duration_min']
-        
-        # Get best efforts for this run
-        pace_2_mile = row.get('2_mile_pace_min_per_km')
-        pace_1k = row.get('1k_pace_min_per_km') 
-        pace_5k = row.get('5k_pace_min_per_km')
-        pace_10k = row.get('10k_pace_min_per_km')
-        
-        # Calculate HR percentages if HR data available
-        avg_hr_pct = (avg_hr / self.max_hr * 100) if avg_hr > 0 else 0
-        max_hr_pct = (max_hr_run / self.max_hr * 100) if max_hr_run > 0 else 0
-        
-        # Classification logic using improved rules (in training intensity order)
-        
-        # 1. RACES - Using best efforts compared to PBs
-        if self._is_race(pace_5k, pace_10k):
-            return "Race"
-        
-        # 2. VO2 MAX INTERVALS - Using max HR and 1K best effort
-        if self._is_vo2_max_intervals(pace_1k, max_hr_pct):
-            return "VO₂ Max Intervals"
-        
-        # 3. LACTATE THRESHOLD - Using max HR and 2-mile best effort
-        if self._is_lactate_threshold(pace_2_mile, max_hr_pct):
-            return "Lactate Threshold"
-        
-        # 4. RECOVERY RUNS
-        if self._is_recovery_run(distance_km, avg_hr_pct):
-            return "Recovery"
-        
-        # 5. ENDURANCE RUNS
-        if self._is_endurance_run(distance_km, duration_min):
-            return "Endurance"
-        
-        # 6. GENERAL AEROBIC RUNS
-        if self._is_general_aerobic(distance_km, avg_hr_pct, duration_min):
-            return "General Aerobic"
-        
-        # 7. OTHER - Everything else (for investigation)
-        return "Other"
+    def _column(self, df, column):
+        """Column as a float array, all-NaN if the data doesn't have it"""
+        if column not in df.columns:
+            return np.full(len(df), np.nan)
+        return df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    def _hr_pct(self, hr):
+        """HR as % of max HR, 0 where HR data is missing"""
+        # Divide only the runs with HR, in place in one result array (same hr / max_hr * 100 as before)
+        hr_pct = np.divide(hr, self.max_hr, out=np.zeros_like(hr), where=hr > 0)
+        hr_pct *= 100
+        return hr_pct
     
     def _is_race(self, pace_5k, pace_10k):
         """Detect races using pace rules"""
         # 5k best effort pace per km < 5km PB pace per km + 10 seconds = Race 
-        if pace_5k and self.known_pb_5k_pace:
-            if pace_5k <= self.known_pb_5k_pace + 0.17:  # +10 seconds = +0.17 min
-                return True
-                
         # 10k best effort pace per km < 10km PB pace per km + 10 seconds = Race
-        if pace_10k and self.known_pb_10k_pace:
-            if pace_10k <= self.known_pb_10k_pace + 0.17:  # +10 seconds = +0.17 min
-                return True
-                
-        return False
+        # (+10 seconds = +0.17 min, missing best efforts never match)
+        return ((pace_5k <= self.known_pb_5k_pace + 0.17) |
+                (pace_10k <= self.known_pb_10k_pace + 0.17))
     
     def _is_vo2_max_intervals(self, pace_1k, max_hr_pct):
         """Detect VO2 max intervals using max HR and 1K best effort"""
-        # Max HR >= 95% OR 1k best effort pace <= 5K PB + 5 seconds
-        if max_hr_pct >= 95:
-            return True
-            
-        if pace_1k and self.known_pb_5k_pace:
-            if pace_1k <= self.known_pb_5k_pace + 0.083:  # +5 seconds = +0.083 min
-                return True
-        
-        return False
+        # Max HR >= 95% OR 1k best effort pace <= 5K PB + 5 seconds (+0.083 min)
+        return (max_hr_pct >= 95) | (pace_1k <= self.known_pb_5k_pace + 0.083)
     
     def _is_lactate_threshold(self, pace_2_mile, max_hr_pct):
         """Detect lactate threshold using max HR and 2-mile best effort"""
-        # Must have max HR >= 85% AND 2-mile best effort <= 10K PB + 25 seconds
-        if max_hr_pct >= 85 and pace_2_mile and self.known_pb_10k_pace:
-            if pace_2_mile <= self.known_pb_10k_pace + 0.42:  # +25 seconds = +0.42 min
-                return True
-        
-        return False
+        # Must have max HR >= 85% AND 2-mile best effort <= 10K PB + 25 seconds (+0.42 min)
+        return (max_hr_pct >= 85) & (pace_2_mile <= self.known_pb_10k_pace + 0.42)
     
     def _is_recovery_run(self, distance_km, avg_hr_pct):
         """Recovery: Distance <= 8km AND avg HR < 70%"""
-        return (distance_km <= 8.0 and avg_hr_pct < 70 and avg_hr_pct > 0)
+        return (distance_km <= 8.0) & (avg_hr_pct < 70) & (avg_hr_pct > 0)
     
     def _is_endurance_run(self, distance_km, duration_min):
         """Endurance: Distance >= 12km AND duration >= 60 minutes"""
-        return (distance_km >= 12 and duration_min >= 60)
+        return (distance_km >= 12) & (duration_min >= 60)
     
     def _is_general_aerobic(self, distance_km, avg_hr_pct, duration_min):
         """General Aerobic: 3-12km, 15+ min duration, 70-81% avg HR"""
-        return (distance_km >= 3 and distance_km < 12 and  
-                duration_min >= 15 and
-                avg_hr_pct >= 70 and avg_hr_pct <= 81)
+        return ((distance_km >= 3) & (distance_km < 12) &
+                (duration_min >= 15) &
+                (avg_hr_pct >= 70) & (avg_hr_pct <= 81))
     
     def classify_dataframe(self, df):
         """Classify all runs in a dataframe"""
@@ -137,8 +93,24 @@ class PfitzRunClassifier:
         # First calculate personal bests from the data
         self.calculate_personal_bests(df)
         
-        # Then classify each run
-        df['run_type'] = df.apply(self.classify_run, axis=1)
+        # Then classify every run at once using whole-column rules
+        distance_km = self._column(df, 'distance_km')
+        duration_min = self._column(df, 'duration_min')
+        avg_hr_pct = self._hr_pct(self._column(df, 'average_heartrate'))
+        max_hr_pct = self._hr_pct(self._column(df, 'max_heartrate'))
+        
+        conditions = [
+            self._is_race(self._column(df, '5k_pace_min_per_km'), self._column(df, '10k_pace_min_per_km')),
+            self._is_vo2_max_intervals(self._column(df, '1k_pace_min_per_km'), max_hr_pct),
+            self._is_lactate_threshold(self._column(df, '2_mile_pace_min_per_km'), max_hr_pct),
+            self._is_recovery_run(distance_km, avg_hr_pct),
+            self._is_endurance_run(distance_km, duration_min),
+            self._is_general_aerobic(distance_km, avg_hr_pct, duration_min),
+        ]
+        # Pick int8 category codes in one select pass and build the categorical once, no per-run strings
+        codes = np.select(conditions, [np.int8(self.RUN_TYPES.index(t)) for t in self.RUN_TYPE_PRIORITY],
+                          default=np.int8(self.RUN_TYPES.index('Other')))
+        df['run_type'] = pd.Categorical.from_codes(codes, categories=self.RUN_TYPES, ordered=True)
         
         return df
     
@@ -146,7 +118,7 @@ class PfitzRunClassifier:
         """Get summary of run type distribution"""
         classified_df = self.classify_dataframe(df)
         
-        summary = classified_df.groupby('run_type').agg({
+        summary = classified_df.groupby('run_type', observed=True).agg({
             'distance_km': ['count', 'mean'],
             'pace_min_per_km': 'mean',
             'average_heartrate': 'mean'
@@ -158,10 +130,9 @@ def analyze_your_runs():
     """Analyze your running data with improved classification"""
     # Load enhanced running data
     try:
-        df = pd.read_csv('running_data.csv')
-        df['date'] = pd.to_datetime(df['date'])
+        df = load_data(RUNNING_DATA)
     except FileNotFoundError:
-        print("❌ running_data.csv not found. Run fetch_activities.py first.")
+        print("❌ running_data not found. Run fetch_activities.py first.")
         return None
     
     print(f"🏃 Analyzing {len(df)} runs with improved classification...")
@@ -181,10 +152,8 @@ def analyze_your_runs():
     total_runs = len(classified_df)
     
     # Show in training intensity order
-    intensity_order = ['Recovery', 'General Aerobic', 'Endurance', 'Lactate Threshold', 'VO₂ Max Intervals', 'Race', 'Other']
-    
-    for run_type in intensity_order:
-        if run_type in run_type_counts:
+    for run_type in classifier.RUN_TYPES:
+        if run_type_counts.get(run_type, 0) > 0:
             count = run_type_counts[run_type]
             percentage = (count / total_runs) * 100
             print(f"{run_type:20}: {count:2d} runs ({percentage:4.1f}%)")
@@ -199,9 +168,9 @@ def analyze_your_runs():
         hr_info = f" | HR: {row['average_heartrate']:.0f}" if row['average_heartrate'] > 0 else ""
         print(f"{date_str}: {row['name'][:25]:25} → {row['run_type']:15} | {row['distance_km']:.1f}km{hr_info}")
     
-    # Save classified data
-    classified_df.to_csv('classified_running_data.csv', index=False)
-    print(f"\n💾 Classified data saved to 'classified_running_data.csv'")
+    # Save classified data - run_type is stored as an ordered category, so loaders get it ready to use
+    save_data(classified_df, CLASSIFIED_RUNNING_DATA)
+    print(f"\n💾 Classified data saved to 'classified_running_data.parquet'")
     
     # Show training insights
     print(f"\n🎯 Training Distribution Insights:")
@@ -1,171 +1,512 @@
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import numpy as np
+import orjson
 import pandas as pd
 from datetime import datetime
+import sqlite3
+import threading
 import time
+from contextlib import closing
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from config import CLIENT_ID, CLIENT_SECRET
+from data_store import RUNNING_DATA, load_data, save_data
 
+# Detail requests in flight at once - Strava's limits are per 15 minutes, not per connection
+MAX_CONCURRENT_REQUESTS = 8
+# Pause before the 15-minute quota is used up, leaving room for the requests already in flight
+RATE_LIMIT_HEADROOM = MAX_CONCURRENT_REQUESTS
+RATE_LIMIT_WINDOW_SEC = 15 * 60
+MAX_RETRIES = 3
+# First wait after a 429 that doesn't say what the limit is - doubled on each retry
+RATE_LIMIT_BACKOFF_SEC = 10
+# Most activities Strava returns from one list request
+SUMMARY_PAGE_SIZE = 200
+
+# Detail responses are cached locally - a finished activity doesn't change, but one fetched
+# within a day of its start may still be edited (name, workout type) so it is refreshed sooner
+DETAIL_CACHE_DB = 'strava_detail_cache.db'
+DETAIL_CACHE_TTL_SEC = 30 * 24 * 60 * 60
+RECENT_DETAIL_CACHE_TTL_SEC = 60 * 60
+RECENT_ACTIVITY_SEC = 24 * 60 * 60
+
+# Standard best effort distances we care about (in meters)
+_TARGETS = np.array([
+    (400, '400m'),
+    (804.67, '0.5_mile'),  # 0.5 mile in meters
+    (1000, '1k'),
+    (1609.34, '1_mile'),   # 1 mile in meters
+    (3218.69, '2_mile'),   # 2 miles in meters
+    (5000, '5k'),
+    (10000, '10k')
+], dtype=[('dist', 'f8'), ('name', 'U10')])
+_TARGETS.flags.writeable = False
+BEST_EFFORT_TOLERANCE_M = 50
+
+TOKENS_FILE = 'strava_tokens.json'
+# Refresh the access token this long before Strava's expiry time
+TOKEN_REFRESH_MARGIN_SEC = 60
+
+# Strava activity types counted as runs
+RUNNING_TYPES = frozenset({'Run', 'TrailRun', 'Treadmill'})
+
+# Activity summary fields kept for the running dataframe
+SUMMARY_FIELDS = ['start_date', 'name', 'distance', 'moving_time', 'total_elevation_gain', 'average_speed',
+                  'max_speed', 'average_heartrate', 'max_heartrate', 'kudos_count', 'id']
+NUMERIC_SUMMARY_FIELDS = ['distance', 'moving_time', 'total_elevation_gain', 'average_speed', 'max_speed',
+                          'average_heartrate', 'max_heartrate']
+
+# Reuse keep-alive HTTPS connections to Strava instead of a new handshake per request.
+# Server errors are retried here (the last response is returned, not raised) - 429s are left
+# to the rate limit handling below
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(
+    pool_connections=MAX_CONCURRENT_REQUESTS,
+    pool_maxsize=MAX_CONCURRENT_REQUESTS,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504], raise_on_status=False)
+))
+
+# Token refreshes get their own session - the main session's auth is the TokenManager itself
+_token_session = requests.Session()
+_token_session.mount('https://', HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504], raise_on_status=False)
+))
+
+# Latest 15-minute usage/limit reported by Strava's rate limit headers, and the window it is for
+_rate_limit = {'window': None, 'usage': 0, 'limit': None, 'announced': None}
+_rate_limit_lock = threading.Lock()
+
+def get_session():
+    """Shared requests session used for Strava API calls"""
+    return _session
+
+@lru_cache(maxsize=1)
 def load_tokens():
-    """Load saved Strava tokens"""
-    with open('strava_tokens.json', 'r') as f:
+    """Load saved Strava tokens (read from disk once until they are saved again)"""
+    with open(TOKENS_FILE, 'r') as f:
         return json.load(f)
 
-def fetch_activities_summary(limit=50):
-    """Fetch basic activities list"""
-    tokens = load_tokens()
-    headers = {'Authorization': f"Bearer {tokens['access_token']}"}
+def save_tokens(tokens):
+    """Save Strava tokens for the next run"""
+    with open(TOKENS_FILE, 'w') as f:
+        json.dump(tokens, f)
+    load_tokens.cache_clear()
+
+class TokenManager(requests.auth.AuthBase):
+    """
+    Adds the Strava access token to every request on the session
+    The saved tokens are read once, and refreshed (and saved again) just before they
+    expire so a long fetch doesn't start failing with 401s part way through
+    """
+    def __init__(self):
+        self.tokens = None
+        self.refresh_error = None
+        self._lock = threading.Lock()
     
-    url = f"https://www.strava.com/api/v3/athlete/activities?per_page={limit}"
-    response = requests.get(url, headers=headers)
+    @property
+    def access_token(self):
+        with self._lock:
+            if self.tokens is None:
+                self.tokens = load_tokens()
+            if time.time() > self.tokens.get('expires_at', 0) - TOKEN_REFRESH_MARGIN_SEC:
+                self.refresh()
+            return self.tokens['access_token']
     
-    if response.status_code == 200:
-        activities = response.json()
-        print(f"Fetched {len(activities)} activities")
-        return activities
-    else:
-        print(f"Error fetching activities: {response.status_code}")
-        return []
+    def refresh(self):
+        """
+        Swap the refresh token for a new access token
+        A failed refresh is remembered and raised for every later request rather than tried again
+        """
+        if self.refresh_error is None:
+            try:
+                response = _token_session.post('https://www.strava.com/oauth/token', data={
+                    'client_id': CLIENT_ID,
+                    'client_secret': CLIENT_SECRET,
+                    'grant_type': 'refresh_token',
+                    'refresh_token': self.tokens['refresh_token']
+                }, timeout=30)
+            except requests.RequestException as e:
+                self.refresh_error = str(e)
+            else:
+                if response.status_code == 200:
+                    self.tokens.update(response.json())
+                    save_tokens(self.tokens)
+                    return
+                self.refresh_error = f"status {response.status_code}"
+        
+        raise RuntimeError(f"Couldn't refresh the Strava token ({self.refresh_error}) - run strava_auth.py again")
+    
+    def __call__(self, request):
+        request.headers['Authorization'] = f"Bearer {self.access_token}"
+        return request
+
+_session.auth = TokenManager()
+
+def fetch_activities_summary(limit=50, after=None):
+    """
+    Fetch basic activities list, up to SUMMARY_PAGE_SIZE per request
+    If after (unix time) is given only activities started since then are fetched
+    """
+    url = "https://www.strava.com/api/v3/athlete/activities"
+    per_page = min(limit, SUMMARY_PAGE_SIZE)
+    params = {'per_page': per_page}
+    if after is not None:
+        params['after'] = after
+    activities = []
+    
+    page = 1
+    while len(activities) < limit:
+        window = rate_limit_window()
+        response = get_session().get(url, params={**params, 'page': page}, timeout=30)
+        record_rate_limit(response, window)
+        
+        if response.status_code != 200:
+            print(f"Error fetching activities: {response.status_code}")
+            break
+        
+        batch = orjson.loads(response.content)
+        activities.extend(batch)
+        if len(batch) < per_page:
+            break
+        page += 1
+    
+    activities = activities[:limit]
+    print(f"Fetched {len(activities)} activities")
+    return activities
+
+def rate_limit_window():
+    """Number of the current 15-minute window - Strava's windows reset on the quarter hour"""
+    return int(time.time() // RATE_LIMIT_WINDOW_SEC)
+
+def record_rate_limit(response, window):
+    """
+    Remember the 15-minute usage from Strava's rate limit headers (read limits when reported)
+    window is the one the request was sent in - readings from an earlier window are stale and ignored
+    """
+    limit = response.headers.get('X-ReadRateLimit-Limit') or response.headers.get('X-RateLimit-Limit')
+    usage = response.headers.get('X-ReadRateLimit-Usage') or response.headers.get('X-RateLimit-Usage')
+    if not limit or not usage:
+        return
+    
+    # Headers are "15-minute,daily", e.g. "100,1000"
+    with _rate_limit_lock:
+        if _rate_limit['window'] is not None and window < _rate_limit['window']:
+            return
+        if window != _rate_limit['window']:
+            _rate_limit['window'] = window
+            _rate_limit['usage'] = 0
+        _rate_limit['limit'] = int(limit.split(',')[0])
+        _rate_limit['usage'] = max(_rate_limit['usage'], int(usage.split(',')[0]))
+
+def mark_rate_limit_used_up(window):
+    """Treat the window as used up after a 429 - returns False if no limit is known yet"""
+    with _rate_limit_lock:
+        if _rate_limit['limit'] is None:
+            return False
+        if _rate_limit['window'] is None or window >= _rate_limit['window']:
+            _rate_limit['window'] = window
+            _rate_limit['usage'] = _rate_limit['limit']
+        return True
+
+def rate_limit_reached():
+    """Whether the current 15-minute window is (nearly) used up"""
+    with _rate_limit_lock:
+        return (_rate_limit['limit'] is not None and _rate_limit['window'] == rate_limit_window() and
+                _rate_limit['usage'] >= _rate_limit['limit'] - RATE_LIMIT_HEADROOM)
+
+def wait_for_rate_limit():
+    """Block until the next 15-minute window if the current one is (nearly) used up"""
+    if not rate_limit_reached():
+        return
+    
+    window = rate_limit_window()
+    with _rate_limit_lock:
+        announce = _rate_limit['announced'] != window
+        _rate_limit['announced'] = window
+    
+    # Sleep without the lock, so responses still in flight can record their usage meanwhile
+    wait_sec = (window + 1) * RATE_LIMIT_WINDOW_SEC - time.time() + 1
+    if announce:
+        print(f"Strava rate limit nearly reached - waiting {wait_sec:.0f}s for the next window")
+    time.sleep(max(wait_sec, 0))
+
+def _open_detail_cache():
+    conn = sqlite3.connect(DETAIL_CACHE_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS detail_cache (
+            activity_id INTEGER PRIMARY KEY,
+            fetched_at REAL, start_date TEXT, detail TEXT
+        )
+    """)
+    return conn
 
-def fetch_detailed_activity(activity_id):
-    """Fetch detailed data for a specific activity"""
-    tokens = load_tokens()
-    headers = {'Authorization': f"Bearer {tokens['access_token']}"}
+def load_detail_cache(activity_ids):
+    """Load cached detail responses for these activities as {activity_id: (fetched_at, start_date, detail)}"""
+    wanted = set(activity_ids)
+    with closing(_open_detail_cache()) as conn:
+        rows = conn.execute('SELECT activity_id, fetched_at, start_date, detail FROM detail_cache').fetchall()
     
+    return {
+        activity_id: (fetched_at, start_date, orjson.loads(detail))
+        for activity_id, fetched_at, start_date, detail in rows
+        if activity_id in wanted
+    }
+
+def save_detail_to_cache(activity_id, detailed):
+    """Store a successful detail response so re-runs don't hit the API again"""
+    with closing(_open_detail_cache()) as conn, conn:
+        conn.execute('INSERT OR REPLACE INTO detail_cache VALUES (?, ?, ?, ?)',
+                     (activity_id, time.time(), detailed.get('start_date'), orjson.dumps(detailed).decode()))
+
+def is_detail_cache_fresh(fetched_at, start_date):
+    """Whether a cached detail response is recent enough to use without asking Strava"""
+    ttl = DETAIL_CACHE_TTL_SEC
+    if start_date is None or fetched_at - pd.Timestamp(start_date).timestamp() < RECENT_ACTIVITY_SEC:
+        ttl = RECENT_DETAIL_CACHE_TTL_SEC
+    return time.time() - fetched_at < ttl
+
+def fetch_detailed_activity(activity_id, cached=None):
+    """
+    Fetch detailed data for a specific activity
+    If Strava fails (rate limited, server error, no connection) a stale cached copy is returned
+    straight away - only activities without one wait for the rate limit and retry
+    """
     url = f"https://www.strava.com/api/v3/activities/{activity_id}"
-    response = requests.get(url, headers=headers)
+    if cached is not None and rate_limit_reached():
+        print(f"Strava rate limit reached - using cached copy of activity {activity_id}")
+        return cached
+    
+    for attempt in range(MAX_RETRIES + 1):
+        wait_for_rate_limit()
+        window = rate_limit_window()
+        try:
+            response = get_session().get(url, timeout=30)
+        except requests.RequestException as e:
+            if cached is not None:
+                print(f"Error fetching detailed activity {activity_id}: {e} - using cached copy")
+            else:
+                print(f"Error fetching detailed activity {activity_id}: {e}")
+            return cached
+        record_rate_limit(response, window)
+        
+        if response.status_code != 429:
+            break
+        # Over the limit anyway - treat the window as used up and try again in the next one
+        limit_known = mark_rate_limit_used_up(window)
+        if cached is not None:
+            break
+        if not limit_known and attempt < MAX_RETRIES:
+            # No limit to go by - back off instead
+            time.sleep(RATE_LIMIT_BACKOFF_SEC * 2 ** attempt)
     
     if response.status_code == 200:
-        return response.json()
+        # Detail responses are large - orjson decodes them several times faster than response.json()
+        detailed = orjson.loads(response.content)
+        save_detail_to_cache(activity_id, detailed)
+        return detailed
+    elif cached is not None:
+        print(f"Error fetching detailed activity {activity_id}: {response.status_code} - using cached copy")
+        return cached
     else:
         print(f"Error fetching detailed activity {activity_id}: {response.status_code}")
         return None
 
-def extract_best_efforts(detailed_activity):
-    """Extract best efforts data from detailed activity"""
-    best_efforts = detailed_activity.get('best_efforts', [])
-    
-    # Standard distances we care about (in meters)
-    target_distances = {
-        400: '400m',
-        804.67: '0.5_mile',  # 0.5 mile in meters
-        1000: '1k',
-        1609.34: '1_mile',   # 1 mile in meters
-        3218.69: '2_mile',   # 2 miles in meters
-        5000: '5k',
-        10000: '10k'
-    }
+def fetch_detailed_activities(activity_ids):
+    """
+    Fetch detailed data for several activities at once, in the same order
+    Activities with a fresh cached response skip the API. The rest are fetched with up to
+    MAX_CONCURRENT_REQUESTS in flight, paced by Strava's rate limit headers
+    """
+    cache = load_detail_cache(activity_ids)
+    details = {}
+    futures = {}
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        for activity_id in activity_ids:
+            if activity_id in details or activity_id in futures:
+                continue
+            
+            fetched_at, start_date, cached = cache.get(activity_id, (None, None, None))
+            if cached is not None and is_detail_cache_fresh(fetched_at, start_date):
+                details[activity_id] = cached
+            else:
+                futures[activity_id] = executor.submit(fetch_detailed_activity, activity_id, cached)
     
-    efforts_data = {}
+    print(f"Strava detail API calls: {len(futures)} ({len(details)} activities served from cache)")
     
-    for effort in best_efforts:
-        distance = effort.get('distance', 0)
-        
-        # Find matching target distance (with some tolerance)
-        for target_dist, name in target_distances.items():
-            if abs(distance - target_dist) < 50:  # 50m tolerance
-                efforts_data[f'{name}_time_sec'] = effort.get('elapsed_time', None)
-                efforts_data[f'{name}_pace_min_per_km'] = calculate_pace_from_effort(
-                    effort.get('elapsed_time', 0), distance
-                )
-                break
-    
-    return efforts_data
-
-def calculate_pace_from_effort(time_seconds, distance_meters):
-    """Calculate pace in min/km from time and distance"""
-    if time_seconds == 0 or distance_meters == 0:
-        return None
+    details.update({activity_id: future.result() for activity_id, future in futures.items()})
+    return [details[activity_id] for activity_id in activity_ids]
+
+def extract_best_efforts(detailed_activities):
+    """
+    Extract best efforts data from several detailed activities, one row per activity
+    Every effort of every activity is matched and paced in one go
+    """
+    best_efforts = [detailed.get('best_efforts', []) for detailed in detailed_activities]
+    efforts = [effort for activity_efforts in best_efforts for effort in activity_efforts]
+    activity_idx = np.repeat(np.arange(len(best_efforts)), [len(activity_efforts) for activity_efforts in best_efforts])
+    distances = np.fromiter((effort.get('distance', 0) for effort in efforts), dtype=np.float64, count=len(efforts))
+    times = np.fromiter((effort.get('elapsed_time', np.nan) for effort in efforts), dtype=np.float64, count=len(efforts))
+    
+    # Match every effort against every target distance at once (with some tolerance)
+    matches = np.abs(distances[:, None] - _TARGETS['dist'][None, :]) < BEST_EFFORT_TOLERANCE_M
+    matched = matches.any(axis=1)
+    activity_idx, targets = activity_idx[matched], matches.argmax(axis=1)[matched]
+    times = times[matched]
+    paces = calculate_pace_from_efforts(times, distances[matched])
+    
+    # A later effort at the same distance in the same activity replaces an earlier one
+    keys = activity_idx * len(_TARGETS) + targets
+    _, last_from_end = np.unique(keys[::-1], return_index=True)
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[len(keys) - 1 - last_from_end] = True
+    
+    # Columns in the order the distances first turn up
+    _, first = np.unique(targets, return_index=True)
+    efforts_data = {}
+    for target in targets[np.sort(first)]:
+        rows = keep & (targets == target)
+        name = _TARGETS['name'][target]
+        for column, values in ((f'{name}_time_sec', times), (f'{name}_pace_min_per_km', paces)):
+            efforts_data[column] = np.full(len(best_efforts), np.nan)
+            efforts_data[column][activity_idx[rows]] = values[rows]
     
-    distance_km = distance_meters / 1000
-    pace_min_per_km = (time_seconds / 60) / distance_km
-    return round(pace_min_per_km, 2)
+    return pd.DataFrame(efforts_data, index=pd.RangeIndex(len(best_efforts)))
+
+def calculate_pace_from_efforts(times_seconds, distances_meters):
+    """Calculate pace in min/km from arrays of times and distances (NaN where either is 0)"""
+    valid = (times_seconds != 0) & (distances_meters != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        paces = (times_seconds / 60) / (distances_meters / 1000)
+    return np.where(valid, paces, np.nan).round(2)
 
 def filter_running_activities(activities):
     """Filter for running activities only"""
-    running_types = ['Run', 'TrailRun', 'Treadmill']
-    runs = [a for a in activities if a['type'] in running_types]
+    runs = [a for a in activities if a['type'] in RUNNING_TYPES]
     print(f"Found {len(runs)} running activities")
     return runs
 
-def create_running_dataframe(runs):
-    """Convert running data to enhanced pandas DataFrame"""
+def create_running_dataframe(runs, with_details=True):
+    """
+    Convert running data to enhanced pandas DataFrame
+    Best efforts need a detail request per run - without with_details only the summaries are
+    used, which already carry the start location, workout type and temperature
+    """
     if not runs:
         print("No running activities found")
         return pd.DataFrame()
     
-    enhanced_data = []
+    if with_details:
+        # Get detailed data for every run up front - the requests run concurrently
+        print(f"Fetching details for {len(runs)} runs...")
+        details = fetch_detailed_activities([run['id'] for run in runs])
+    else:
+        details = runs
     
-    for i, run in enumerate(runs):
-        print(f"Processing run {i+1}/{len(runs)}: {run['name']}")
-        
-        # Get detailed data for this run
-        detailed = fetch_detailed_activity(run['id'])
-        
+    fetched_runs = []
+    fetched_details = []
+    for run, detailed in zip(runs, details):
         if detailed:
-            # Extract basic data
-            run_data = {
-                'date': run['start_date'][:10],
-                'name': run['name'],
-                'start_datetime': run['start_date'],
-                'distance_km': round(run['distance'] / 1000, 2),
-                'duration_min': round(run['moving_time'] / 60, 1),
-                'elevation_gain': run['total_elevation_gain'],
-                'average_speed_kmh': round(run['average_speed'] * 3.6, 2),
-                'max_speed_kmh': round(run['max_speed'] * 3.6, 2) if run['max_speed'] else None,
-                'average_heartrate': run.get('average_heartrate'),
-                'max_heartrate': run.get('max_heartrate'),
-                'kudos_count': run['kudos_count'],
-                'activity_id': run['id']
-            }
-            
-            # Calculate pace
-            run_data['pace_min_per_km'] = round(run_data['duration_min'] / run_data['distance_km'], 2)
-            
-            # Extract GPS coordinates
-            start_latlng = detailed.get('start_latlng', [None, None])
-            run_data['start_lat'] = start_latlng[0] if start_latlng else None
-            run_data['start_lon'] = start_latlng[1] if start_latlng else None
-            
-            # Extract best efforts
-            best_efforts = extract_best_efforts(detailed)
-            run_data.update(best_efforts)
-            
-            # Extract additional useful fields
-            run_data['workout_type'] = detailed.get('workout_type')
-            run_data['average_temp'] = detailed.get('average_temp')
-            
-            enhanced_data.append(run_data)
-            
-            # Rate limiting - be nice to Strava API
-            time.sleep(0.5)  # 500ms between requests
-        
+            fetched_runs.append(run)
+            fetched_details.append(detailed)
         else:
             print(f"Failed to get detailed data for {run['name']}")
     
-    # Create DataFrame
-    df = pd.DataFrame(enhanced_data)
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
+    # One line for the batch rather than a print per run
+    print(f"Processing {len(fetched_runs)} runs...")
+    
+    if not fetched_runs:
+        return pd.DataFrame()
+    
+    # Build whole columns (dict of lists) and convert units column-wise, not a dict per run
+    summary = pd.DataFrame({field: [run.get(field) for run in fetched_runs] for field in SUMMARY_FIELDS})
+    # Missing values (e.g. no heart rate monitor) become NaN in float columns rather than None objects
+    summary[NUMERIC_SUMMARY_FIELDS] = summary[NUMERIC_SUMMARY_FIELDS].astype(np.float64)
+    max_speed = summary['max_speed'].where(summary['max_speed'] != 0)
+    
+    df = pd.DataFrame({
+        'date': pd.to_datetime(summary['start_date'], utc=True).dt.tz_convert(None).dt.normalize(),
+        'name': summary['name'],
+        'start_datetime': summary['start_date'],
+        'distance_km': (summary['distance'] / 1000).round(2),
+        'duration_min': (summary['moving_time'] / 60).round(1),
+        'elevation_gain': summary['total_elevation_gain'],
+        'average_speed_kmh': (summary['average_speed'] * 3.6).round(2),
+        'max_speed_kmh': (max_speed * 3.6).round(2),
+        'average_heartrate': summary['average_heartrate'],
+        'max_heartrate': summary['max_heartrate'],
+        'kudos_count': summary['kudos_count'],
+        'activity_id': summary['id']
+    })
+    
+    # Calculate pace
+    df['pace_min_per_km'] = (df['duration_min'] / df['distance_km']).round(2)
+    
+    # Extract GPS coordinates
+    start_latlngs = np.array([detailed.get('start_latlng') or [None, None] for detailed in fetched_details],
+                             dtype=np.float64)
+    df['start_lat'] = start_latlngs[:, 0]
+    df['start_lon'] = start_latlngs[:, 1]
     
+    # Extract best efforts
+    best_efforts = extract_best_efforts(fetched_details)
+    df = pd.concat([df, best_efforts], axis=1)
+    
+    # Extract additional useful fields
+    df['workout_type'] = np.array([detailed.get('workout_type') for detailed in fetched_details], dtype=np.float64)
+    df['average_temp'] = np.array([detailed.get('average_temp') for detailed in fetched_details], dtype=np.float64)
+    
+    return df
+
+def load_saved_runs():
+    """Running data saved by an earlier fetch, or None if there isn't any"""
+    try:
+        saved = load_data(RUNNING_DATA)
+    except FileNotFoundError:
+        return None
+    return saved if not saved.empty else None
+
+def merge_runs(saved, new):
+    """
+    Add newly fetched runs to the saved ones, newest first
+    A run fetched again takes the new values, keeping saved ones the fetch didn't return (best efforts, weather)
+    """
+    columns = saved.columns.union(new.columns, sort=False)
+    df = new.set_index('activity_id').combine_first(saved.set_index('activity_id')).reset_index()
+    df = df[columns].sort_values('start_datetime', ascending=False, ignore_index=True)
     return df
 
-def main():
+def main(with_details=False, full_sync=False):
     """Main function to fetch enhanced running data"""
     print("Fetching enhanced running data from Strava...")
     
     try:
+        # Only fetch activities since the last saved run's day, unless a full sync is asked for.
+        # Either way the fetched runs are merged into the saved ones, keeping older runs and weather
+        saved = load_saved_runs()
+        after = None
+        if saved is not None and not full_sync:
+            after = int(saved['date'].max().timestamp())
+            print(f"Fetching activities since {saved['date'].max().strftime('%Y-%m-%d')} (--full to refetch the latest 100)")
+        
         # Fetch activities
-        activities = fetch_activities_summary(100)
+        activities = fetch_activities_summary(100, after=after)
         
         # Filter for runs
         runs = filter_running_activities(activities)
         
         # Create enhanced DataFrame
-        df = create_running_dataframe(runs)
+        df = create_running_dataframe(runs, with_details=with_details)
+        if saved is not None:
+            df = merge_runs(saved, df) if not df.empty else saved
         
         if not df.empty:
             # Save as standard filename for backwards compatibility
-            df.to_csv('running_data.csv', index=False)
-            print(f"\n✅ Enhanced data saved to running_data.csv")
+            save_data(df, RUNNING_DATA)
+            print(f"\n✅ Enhanced data saved to running_data.parquet")
             
             # Print summary
             print(f"\nEnhanced Running Data Summary:")
@@ -197,4 +538,11 @@ def main():
         return None
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch running activities from Strava")
+    parser.add_argument('--with-details', action='store_true',
+                        help="also fetch each run's details for best efforts (one extra request per run)")
+    parser.add_argument('--full', action='store_true',
+                        help="refetch the latest 100 activities instead of only those since the last saved run "
+                             "(merged into the saved data)")
+    args = parser.parse_args()
+    main(with_details=args.with_details, full_sync=args.full)
\ No newline at end of file
@@ -1,45 +1,94 @@
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
+import hashlib
+import webbrowser
+from pathlib import Path
+from data_store import RUNNING_DATA, load_data
 
-# Force browser display
-pio.renderers.default = "browser"
+# orjson serializes the figures' numpy data much faster than the standard json module
+pio.json.config.default_engine = "orjson"
+
+# Only the columns the charts and summary use are read
+PACE_ANALYSIS_COLUMNS = ['date', 'name', 'distance_km', 'pace_min_per_km']
+
+CHART_FILES = ['pace_chart.html', 'volume_chart.html']
+# Hash of the data the saved charts were built from
+CHART_HASH_FILE = 'pace_charts.hash'
+
+def data_file_hash():
+    """Hash of the running data file (Parquet, else CSV), or None if there isn't one"""
+    for path in (f'{RUNNING_DATA}.parquet', f'{RUNNING_DATA}.csv'):
+        try:
+            with open(path, 'rb') as f:
+                return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+        except FileNotFoundError:
+            continue
+    return None
+
+def charts_up_to_date(data_hash):
+    """Whether the saved chart files were built from data with this hash"""
+    hash_file = Path(CHART_HASH_FILE)
+    return (data_hash is not None and hash_file.exists() and hash_file.read_text() == data_hash
+            and all(Path(path).exists() for path in CHART_FILES))
+
+def open_chart(path):
+    """Open a saved chart in the browser"""
+    webbrowser.open(Path(path).resolve().as_uri())
+
+def save_and_open(fig, path):
+    """Write a chart to an HTML file (loading plotly.js from the CDN) and open it in the browser"""
+    fig.write_html(path, include_plotlyjs='cdn', full_html=True)
+    open_chart(path)
 
 def create_pace_analysis():
     # Load the data
-    df = pd.read_csv('running_data.csv')
-    df['date'] = pd.to_datetime(df['date'])
+    df = load_data(RUNNING_DATA, columns=PACE_ANALYSIS_COLUMNS, csv_dtypes={'name': 'category'})
     
     # Filter to recent training (June onwards)
     df = df[df['date'] >= '2025-06-08']
     
-    # Chart 1: Pace over time with distance as bubble size
-    fig1 = px.scatter(df, x='date', y='pace_min_per_km', 
-                     size='distance_km',
-                     hover_data=['name', 'distance_km'],
-                     title='Running Pace Trends (Recent Training)',
-                     labels={'pace_min_per_km': 'Pace (min/km)', 'date': 'Date'})
+    # The charts only depend on the data - if it hasn't changed since they were saved, reopen them
+    data_hash = data_file_hash()
+    charts_current = charts_up_to_date(data_hash)
     
-    fig1.write_html("pace_chart.html")
-    print("Pace chart saved as pace_chart.html - open this file in your browser!")
-    fig1.show(renderer="browser")
+    # Chart 1: Pace over time with distance as bubble size
+    if charts_current:
+        open_chart("pace_chart.html")
+        print("Data unchanged - reopened pace_chart.html")
+    else:
+        fig1 = px.scatter(df, x='date', y='pace_min_per_km', 
+                         size='distance_km',
+                         hover_data=['name', 'distance_km'],
+                         title='Running Pace Trends (Recent Training)',
+                         labels={'pace_min_per_km': 'Pace (min/km)', 'date': 'Date'})
+        
+        save_and_open(fig1, "pace_chart.html")
+        print("Pace chart saved as pace_chart.html - open this file in your browser!")
     
     # Chart 2: Weekly volume vs target
-    df['week'] = df['date'].dt.to_period('W').dt.start_time
-    weekly_data = df.groupby('week')['distance_km'].sum().reset_index()
-    
-    fig2 = px.bar(weekly_data, x='week', y='distance_km',
-                  title='Weekly Volume vs Pfitz Base Target (48km)',
-                  labels={'distance_km': 'Distance (km)', 'week': 'Week'})
-    
-    # Add 48km target line
-    fig2.add_hline(y=48, line_dash="solid", line_color="green",
-                   annotation_text="Pfitz Base Target: 48km")
+    # Monday-start weeks, bucketed straight from the sorted dates (weeks without runs count as 0)
+    weekly_data = (df.sort_values('date')
+                   .resample('W-MON', on='date', closed='left', label='left')['distance_km'].sum()
+                   .rename_axis('week').reset_index())
     
-    fig2.write_html("volume_chart.html")
-    print("Volume chart saved as volume_chart.html - open this file in your browser!")
-    fig2.show(renderer="browser")
+    if charts_current:
+        open_chart("volume_chart.html")
+        print("Data unchanged - reopened volume_chart.html")
+    else:
+        fig2 = px.bar(weekly_data, x='week', y='distance_km',
+                      title='Weekly Volume vs Pfitz Base Target (48km)',
+                      labels={'distance_km': 'Distance (km)', 'week': 'Week'})
+        
+        # Add 48km target line
+        fig2.add_hline(y=48, line_dash="solid", line_color="green",
+                       annotation_text="Pfitz Base Target: 48km")
+        
+        save_and_open(fig2, "volume_chart.html")
+        print("Volume chart saved as volume_chart.html - open this file in your browser!")
+        
+        if data_hash is not None:
+            Path(CHART_HASH_FILE).write_text(data_hash)
     
     # Training analysis
     recent_weeks = weekly_data['distance_km'].tail(4)
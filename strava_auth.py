@@ -1,8 +1,16 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import webbrowser
 from config import CLIENT_ID, CLIENT_SECRET
 
+# One keep-alive connection for the token exchange and the test call that follows it
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504], raise_on_status=False)
+))
+
 def get_strava_tokens():
     # Open browser for authorization
     auth_url = f"https://www.strava.com/oauth/authorize?client_id={CLIENT_ID}&response_type=code&redirect_uri=http://localhost:8050/auth&scope=read,activity:read_all"
@@ -18,7 +26,7 @@ def get_strava_tokens():
     print(f"Got authorization code: {code[:10]}...")
     
     # Exchange code for tokens
-    response = requests.post('https://www.strava.com/oauth/token', data={
+    response = _session.post('https://www.strava.com/oauth/token', data={
         'client_id': CLIENT_ID,
         'client_secret': CLIENT_SECRET,
         'code': code,
@@ -37,7 +45,7 @@ def get_strava_tokens():
         
         # Test the connection
         headers = {'Authorization': f"Bearer {tokens['access_token']}"}
-        athlete = requests.get('https://www.strava.com/api/v3/athlete', headers=headers).json()
+        athlete = _session.get('https://www.strava.com/api/v3/athlete', headers=headers).json()
         print(f"Connected as: {athlete['firstname']} {athlete['lastname']}")
         
         return tokens